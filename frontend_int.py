@@ -1,3 +1,9 @@
+import json
+import os
+import re
+import tempfile
+import threading
+
 import streamlit as st
 from snowflake.core import Root
 from snowflake.cortex import Complete
@@ -15,6 +21,29 @@ MODELS = [
     "llama3-8b",
 ]
 
+# Service metadata from the last successful discovery, served on cold start
+SERVICE_CACHE_PATH = os.path.join(tempfile.gettempdir(), "petapp_service_cache.json")
+
+# Number of streamed completion chunks between placeholder redraws
+STREAM_RENDER_EVERY = 8
+
+# Escapes "$" so Streamlit markdown doesn't render it as LaTeX
+DOLLAR_ESCAPE_TABLE = str.maketrans({"$": r"\$"})
+
+# Pet info fields included in the prompt as (key, label, suffix)
+PET_CONTEXT_FIELDS = (
+    ("name", "Pet name", ""),
+    ("type", "Type", ""),
+    ("breed", "Breed", ""),
+    ("age", "Age", " years"),
+    ("weight", "Weight", " lbs"),
+    ("spayed_neutered", "Spayed/Neutered", ""),
+    ("medical_conditions", "Medical conditions", ""),
+)
+
+# Pronouns that suggest a question refers back to earlier chat history
+FOLLOW_UP_PATTERN = re.compile(r"\b(it|they|this|that|he|she|them|those)\b", re.I)
+
 # Page configuration
 st.set_page_config(
     page_title="🐾 Pet Health Assistant",
@@ -24,8 +53,7 @@ st.set_page_config(
 )
 
 # Custom CSS for pet health theme
-st.markdown(
-    """
+CUSTOM_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -61,9 +89,17 @@ st.markdown(
         border-radius: 1rem;
     }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
+
+
+@st.cache_resource(show_spinner=False)
+def _inject_css():
+    """Emit the custom CSS; reruns replay the cached element"""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+    return True
+
+
+_inject_css()
 
 
 def init_messages():
@@ -73,75 +109,141 @@ def init_messages():
         or "messages" not in st.session_state
     ):
         st.session_state.messages = []
-
-
-def init_service_metadata():
-    """Initialize cortex search service metadata"""
-    if "service_metadata" not in st.session_state:
-        service_metadata = []
-        try:
-            # Try to show services in current context first
-            services = session.sql("SHOW CORTEX SEARCH SERVICES;").collect()
-            if services:
-                for s in services:
-                    try:
-                        svc_name = s["name"]
-                        svc_search_col = session.sql(
-                            f"DESC CORTEX SEARCH SERVICE {svc_name};"
-                        ).collect()[0]["search_column"]
-                        service_metadata.append(
-                            {"name": svc_name, "search_column": svc_search_col}
-                        )
-                    except Exception as e:
-                        st.sidebar.error(f"Error describing service {svc_name}: {e}")
-
-            # Also try to specifically check for our known service in PETAPP.DATA
-            try:
-                # Try to describe the specific service we know about
-                test_service = session.sql(
-                    "DESC CORTEX SEARCH SERVICE PETAPP.DATA.CC_SEARCH_SERVICE_CS;"
-                ).collect()
-                if test_service:
-                    # Check if it's already in our list
-                    existing_names = [s["name"] for s in service_metadata]
-                    if "PETAPP.DATA.CC_SEARCH_SERVICE_CS" not in existing_names:
-                        service_metadata.append(
-                            {
-                                "name": "PETAPP.DATA.CC_SEARCH_SERVICE_CS",
-                                "search_column": test_service[0]["search_column"],
-                            }
-                        )
-            except Exception as e:
-                st.sidebar.warning(
-                    f"Could not access PETAPP.DATA.CC_SEARCH_SERVICE_CS: {e}"
-                )
-
-            # If still no services found, create fallback
-            if not service_metadata:
-                service_metadata = [
-                    {
-                        "name": "PETAPP.DATA.CC_SEARCH_SERVICE_CS",
-                        "search_column": "chunk",  # Common default
-                    }
-                ]
-                st.sidebar.warning(
-                    "Using fallback configuration for PETAPP.DATA.CC_SEARCH_SERVICE_CS"
-                )
-
-        except Exception as e:
-            st.sidebar.error(f"Error querying Cortex Search Services: {e}")
-            # Fallback - assume the service exists with default search column
-            service_metadata = [
+        st.session_state.history_str = ""
+
+
+def _query_services() -> list[dict]:
+    """Query available cortex search services (names only, no DESC calls)"""
+    service_metadata = []
+    # Try to show services in current context first. SHOW already returns the
+    # search column for most accounts; anything missing is resolved lazily by
+    # get_search_column() when the service is actually queried.
+    services = session.sql("SHOW CORTEX SEARCH SERVICES;").collect()
+    known_service_found = False
+    for s in services:
+        row = s.as_dict()
+        svc_name = row["name"]
+        svc_search_col = row.get("search_column")
+        service_metadata.append({"name": svc_name, "search_column": svc_search_col})
+
+        if (
+            svc_name.upper() == "CC_SEARCH_SERVICE_CS"
+            and str(row.get("database_name", "")).upper() == "PETAPP"
+            and str(row.get("schema_name", "")).upper() == "DATA"
+        ):
+            known_service_found = True
+            service_metadata.append(
                 {
                     "name": "PETAPP.DATA.CC_SEARCH_SERVICE_CS",
-                    "search_column": "chunk",  # Common default
+                    "search_column": svc_search_col,
                 }
-            ]
-            st.sidebar.warning(
-                "Using fallback configuration. Please verify the service exists."
             )
 
-        st.session_state.service_metadata = service_metadata
+    # Always offer our known service in PETAPP.DATA, even when it lives
+    # outside the current context
+    if not known_service_found:
+        service_metadata.append(
+            {"name": "PETAPP.DATA.CC_SEARCH_SERVICE_CS", "search_column": None}
+        )
+
+    return service_metadata
+
+
+def _load_service_cache():
+    """Load service metadata persisted by a previous discovery, if any"""
+    try:
+        with open(SERVICE_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_service_cache(service_metadata):
+    """Persist discovered service metadata for the next cold start"""
+    try:
+        with open(SERVICE_CACHE_PATH, "w") as f:
+            json.dump(service_metadata, f)
+    except OSError:
+        pass
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _discover_services() -> list[dict]:
+    """Discover available cortex search services"""
+    try:
+        service_metadata = _query_services()
+        _save_service_cache(service_metadata)
+    except Exception as e:
+        st.sidebar.error(f"Error querying Cortex Search Services: {e}")
+        # Fallback - assume the service exists with default search column
+        service_metadata = [
+            {
+                "name": "PETAPP.DATA.CC_SEARCH_SERVICE_CS",
+                "search_column": "chunk",  # Common default
+            }
+        ]
+        st.sidebar.warning(
+            "Using fallback configuration. Please verify the service exists."
+        )
+
+    return service_metadata
+
+
+def _refresh_services():
+    """Re-run discovery and update the on-disk cache for new sessions"""
+    try:
+        service_metadata = _query_services()
+    except Exception:
+        # Keep serving the cached services
+        return
+    # Runs detached from any session, so leave st.session_state alone
+    _save_service_cache(service_metadata)
+    _discover_services.clear()
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _start_service_refresh():
+    """Start a background discovery refresh, at most once per TTL per process"""
+    thread = threading.Thread(target=_refresh_services, daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_search_column(service_name: str) -> str:
+    """Resolve the search column of a cortex search service on first use"""
+    if service_name == "PETAPP.DATA.CC_SEARCH_SERVICE_CS":
+        # Known default, no need to DESC the service
+        return "chunk"
+    try:
+        desc = session.sql(f"DESC CORTEX SEARCH SERVICE {service_name};").collect()
+        return desc[0]["search_column"]
+    except Exception as e:
+        st.sidebar.warning(f"Could not describe service {service_name}: {e}")
+        return "chunk"
+
+
+def _set_service_index(service_metadata):
+    """Store service metadata and its by-name index in session state"""
+    st.session_state.service_metadata = service_metadata
+    st.session_state.service_metadata_by_name = {
+        s["name"]: s["search_column"] for s in service_metadata
+    }
+
+
+def init_service_index():
+    """Initialize the index of available cortex search services"""
+    if "service_metadata" not in st.session_state:
+        cached_services = _load_service_cache()
+        if cached_services:
+            # Serve the services from the last discovery immediately and
+            # refresh them in the background
+            _set_service_index(cached_services)
+            _start_service_refresh()
+        else:
+            # Discovery is cached per server process, so only the first session
+            # pays for the SHOW round-trip
+            _set_service_index(_discover_services())
 
 
 def init_pet_info():
@@ -150,22 +252,48 @@ def init_pet_info():
         st.session_state.pet_info = {}
 
 
+def get_session_context():
+    """Return the session's current (database, schema), looked up on first use"""
+    # The context doesn't change mid-session, and fully qualified service
+    # names never need it, so only look it up when first asked for
+    if "current_db" not in st.session_state:
+        st.session_state.current_db = session.get_current_database()
+        st.session_state.current_schema = session.get_current_schema()
+    return st.session_state.current_db, st.session_state.current_schema
+
+
+def parse_service_path(name):
+    """Split a service name into (database, schema, name)"""
+    parts = name.split(".", 2)
+    if len(parts) == 3:
+        return tuple(parts)
+    # Unqualified names resolve against the current context
+    return (*get_session_context(), name)
+
+
 def init_selected_service():
     """Initialize selected cortex search service and default config values"""
     if "selected_cortex_search_service" not in st.session_state:
         # Set default service if available
         if st.session_state.service_metadata:
             target_service = "PETAPP.DATA.CC_SEARCH_SERVICE_CS"
-            service_names = [s["name"] for s in st.session_state.service_metadata]
-            if target_service in service_names:
+            if target_service in st.session_state.service_metadata_by_name:
                 st.session_state.selected_cortex_search_service = target_service
             else:
-                st.session_state.selected_cortex_search_service = service_names[0]
+                st.session_state.selected_cortex_search_service = (
+                    st.session_state.service_metadata[0]["name"]
+                )
         else:
             st.session_state.selected_cortex_search_service = (
                 "PETAPP.DATA.CC_SEARCH_SERVICE_CS"
             )
 
+    # Parse the selected service name once per selection, not on every search
+    selected_service = st.session_state.selected_cortex_search_service
+    if st.session_state.get("selected_svc_path_name") != selected_service:
+        st.session_state.selected_svc_path = parse_service_path(selected_service)
+        st.session_state.selected_svc_path_name = selected_service
+
     # Initialize default configuration values
     if "model_name" not in st.session_state:
         st.session_state.model_name = "mistral-large2"
@@ -179,11 +307,13 @@ def init_selected_service():
         st.session_state.debug = False
 
 
+@st.fragment
 def display_pet_info_sidebar():
     """Display pet information input in sidebar"""
-    st.sidebar.markdown("### 🐕 Pet Information")
+    # Fragments can't call st.sidebar directly; main() renders this inside it
+    st.markdown("### 🐕 Pet Information")
 
-    with st.sidebar.expander("Pet Details (Helps improve responses)", expanded=False):
+    with st.expander("Pet Details (Helps improve responses)", expanded=False):
         pet_types = [
             "",
             "Dog",
@@ -202,71 +332,88 @@ def display_pet_info_sidebar():
         except ValueError:
             pet_type_index = 0
 
-        pet_name = st.text_input(
-            "Pet Name",
-            value=st.session_state.pet_info.get("name", ""),
-            placeholder="e.g., Buddy",
-        )
-        pet_type = st.selectbox("Pet Type", pet_types, index=pet_type_index)
-        pet_breed = st.text_input(
-            "Breed",
-            value=st.session_state.pet_info.get("breed", ""),
-            placeholder="e.g., Golden Retriever",
-        )
+        with st.form("pet_info_form", clear_on_submit=False):
+            pet_name = st.text_input(
+                "Pet Name",
+                value=st.session_state.pet_info.get("name", ""),
+                placeholder="e.g., Buddy",
+            )
+            pet_type = st.selectbox("Pet Type", pet_types, index=pet_type_index)
+            pet_breed = st.text_input(
+                "Breed",
+                value=st.session_state.pet_info.get("breed", ""),
+                placeholder="e.g., Golden Retriever",
+            )
+
+            col1, col2 = st.columns(2)
+            with col1:
+                pet_age = st.number_input(
+                    "Age (years)",
+                    min_value=0.0,
+                    max_value=30.0,
+                    step=0.5,
+                    value=st.session_state.pet_info.get("age", 0.0) or 0.0,
+                )
+            with col2:
+                pet_weight = st.number_input(
+                    "Weight (lbs)",
+                    min_value=0.0,
+                    step=0.1,
+                    value=st.session_state.pet_info.get("weight", 0.0) or 0.0,
+                )
 
-        col1, col2 = st.columns(2)
-        with col1:
-            pet_age = st.number_input(
-                "Age (years)",
-                min_value=0.0,
-                max_value=30.0,
-                step=0.5,
-                value=st.session_state.pet_info.get("age", 0.0) or 0.0,
+            # Additional details
+            spayed_neutered_options = ["Unknown", "Yes", "No"]
+            spayed_neutered_value = st.session_state.pet_info.get(
+                "spayed_neutered", "Unknown"
             )
-        with col2:
-            pet_weight = st.number_input(
-                "Weight (lbs)",
-                min_value=0.0,
-                step=0.1,
-                value=st.session_state.pet_info.get("weight", 0.0) or 0.0,
+            try:
+                spayed_neutered_index = spayed_neutered_options.index(
+                    spayed_neutered_value
+                )
+            except ValueError:
+                spayed_neutered_index = 0
+            spayed_neutered = st.selectbox(
+                "Spayed/Neutered", spayed_neutered_options, index=spayed_neutered_index
             )
 
-        # Additional details
-        spayed_neutered_options = ["Unknown", "Yes", "No"]
-        spayed_neutered_value = st.session_state.pet_info.get(
-            "spayed_neutered", "Unknown"
-        )
-        try:
-            spayed_neutered_index = spayed_neutered_options.index(spayed_neutered_value)
-        except ValueError:
-            spayed_neutered_index = 0
-        spayed_neutered = st.selectbox(
-            "Spayed/Neutered", spayed_neutered_options, index=spayed_neutered_index
-        )
+            medical_conditions = st.text_area(
+                "Known Medical Conditions",
+                value=st.session_state.pet_info.get("medical_conditions", ""),
+                placeholder="Any existing conditions or medications...",
+            )
 
-        medical_conditions = st.text_area(
-            "Known Medical Conditions",
-            value=st.session_state.pet_info.get("medical_conditions", ""),
-            placeholder="Any existing conditions or medications...",
-        )
+            # Store updated pet info only when the form is submitted
+            if st.form_submit_button("Update", use_container_width=True):
+                st.session_state.pet_info = {
+                    "name": pet_name if pet_name else None,
+                    "type": pet_type if pet_type else None,
+                    "breed": pet_breed if pet_breed else None,
+                    "age": pet_age if pet_age > 0 else None,
+                    "weight": pet_weight if pet_weight > 0 else None,
+                    "spayed_neutered": spayed_neutered
+                    if spayed_neutered != "Unknown"
+                    else None,
+                    "medical_conditions": medical_conditions
+                    if medical_conditions
+                    else None,
+                }
+                # Refresh the pet card in the main area
+                st.rerun()
 
-        # Store updated pet info
-        st.session_state.pet_info = {
-            "name": pet_name if pet_name else None,
-            "type": pet_type if pet_type else None,
-            "breed": pet_breed if pet_breed else None,
-            "age": pet_age if pet_age > 0 else None,
-            "weight": pet_weight if pet_weight > 0 else None,
-            "spayed_neutered": spayed_neutered
-            if spayed_neutered != "Unknown"
-            else None,
-            "medical_conditions": medical_conditions if medical_conditions else None,
-        }
 
+def select_sample_question():
+    """Queue the picked sample question and clear the pill selection"""
+    if st.session_state.sample_pick:
+        st.session_state.sample_question = st.session_state.sample_pick
+        st.session_state.sample_question_pending = True
+    st.session_state.sample_pick = None
 
+
+@st.fragment
 def display_sample_questions():
     """Display sample questions for common pet health topics"""
-    st.sidebar.markdown("### 💡 Common Questions")
+    st.markdown("### 💡 Common Questions")
 
     sample_questions = [
         "What are the signs of dehydration in dogs?",
@@ -279,108 +426,131 @@ def display_sample_questions():
         "How do I introduce a new pet to my household?",
     ]
 
-    st.sidebar.markdown("Click to ask:")
-    for i, question in enumerate(sample_questions):
-        if st.sidebar.button(
-            f"❓ {question}", key=f"sample_{i}", use_container_width=True
-        ):
-            st.session_state.sample_question = question
-            st.rerun()
+    # A single pills widget instead of one button per question
+    st.pills(
+        "Click to ask:",
+        sample_questions,
+        selection_mode="single",
+        default=None,
+        key="sample_pick",
+        on_change=select_sample_question,
+    )
+    if st.session_state.pop("sample_question_pending", False):
+        st.rerun(scope="app")
+
+
+@st.cache_resource(show_spinner=False)
+def _get_search_svc(svc_path: tuple):
+    """Resolve the cortex search service handle for a (db, schema, name) path"""
+    db, schema, svc_name = svc_path
+    return root.databases[db].schemas[schema].cortex_search_services[svc_name]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_search(
+    svc_path: tuple,
+    search_col: str,
+    query: str,
+    columns: tuple,
+    filter: dict,
+    k: int,
+) -> tuple[str, list]:
+    """Retrieve documents for a query and build the context string"""
+    try:
+        # The service handle is cached per process, so only the first question
+        # pays for resolving it through the metadata layer
+        cortex_search_service = _get_search_svc(svc_path)
+        results = cortex_search_service.search(
+            query,
+            columns=list(columns),
+            filter=filter,
+            limit=k,
+        ).results
+    except Exception:
+        results = None
+
+    if results is None:
+        # Fall back to querying the underlying search index table directly
+        # This assumes the search service is built on a table we can access.
+        # Errors propagate to the caller so a failed retrieval is never cached
+
+        # Try to find what tables are available in the PETAPP.DATA schema
+        tables_sql = "SHOW TABLES IN SCHEMA PETAPP.DATA"
+        tables_result = session.sql(tables_sql).collect()
+
+        # Look for likely search index tables
+        search_tables = []
+        for table in tables_result:
+            table_name = table["name"].upper()
+            if any(
+                keyword in table_name
+                for keyword in [
+                    "SEARCH",
+                    "INDEX",
+                    "CHUNK",
+                    "DOCUMENT",
+                    "VET",
+                    "PET",
+                ]
+            ):
+                search_tables.append(f"PETAPP.DATA.{table_name}")
+
+        if search_tables:
+            # Use the first likely table and do a simple text search
+            search_table = search_tables[0]
+            simple_sql = f"""
+            SELECT
+                chunk,
+                file_url,
+                relative_path,
+                title
+            FROM {search_table}
+            WHERE UPPER(chunk) LIKE UPPER('%{query.replace("'", "''")}%')
+            LIMIT {k}
+            """
+
+            df = session.sql(simple_sql).to_pandas()
+            results = df.to_dict("records")
+        else:
+            # Fallback - return empty results
+            results = []
+
+    # Build context string from results
+    context_parts = []
+    for i, r in enumerate(results):
+        # Try different possible column names for the text content
+        text_content = ""
+        for col_name in [search_col.lower(), "chunk", "content", "text", "body"]:
+            if col_name in r and r[col_name]:
+                text_content = r[col_name]
+                break
+
+        if text_content:
+            context_parts.append(f"Context document {i + 1}: {text_content} \n\n")
+    context_str = "".join(context_parts)
+
+    return context_str, results
 
 
 def query_cortex_search_service(query, columns=[], filter={}):
     """Query the cortex search service for relevant pet health documents"""
     try:
-        # Use SQL-based approach since CORTEX.SEARCH function may not be available
-        # Let's try using the SEARCH method through SQL
         service_name = st.session_state.selected_cortex_search_service
 
-        # Build the SQL query for cortex search
-        columns_clause = ""
-        if columns:
-            columns_str = "', '".join(columns)
-            columns_clause = f", ARRAY_CONSTRUCT('{columns_str}')"
-
-        filter_clause = ""
-        if filter:
-            filter_items = []
-            for key, value in filter.items():
-                filter_items.append(f"'{key}', '{value}'")
-            filter_clause = f", OBJECT_CONSTRUCT({', '.join(filter_items)})"
-
-        # Try direct SQL approach first
-        sql = f"""
-        SELECT
-            chunk,
-            file_url,
-            relative_path,
-            title
-        FROM TABLE(
-            RESULT_SCAN(LAST_QUERY_ID())
+        # Resolve the search column lazily, preferring the value from SHOW
+        search_col = st.session_state.service_metadata_by_name.get(
+            service_name
+        ) or get_search_column(service_name)
+
+        # Identical questions within the TTL reuse the cached retrieval
+        context_str, results = _cached_search(
+            st.session_state.selected_svc_path,
+            search_col,
+            query,
+            tuple(columns),
+            filter,
+            st.session_state.num_retrieved_chunks,
         )
-        """
-
-        # For now, let's use a simpler approach - query the underlying search index table
-        # This assumes the search service is built on a table we can access
-        try:
-            # Try to find what tables are available in the PETAPP.DATA schema
-            tables_sql = "SHOW TABLES IN SCHEMA PETAPP.DATA"
-            tables_result = session.sql(tables_sql).collect()
-
-            # Look for likely search index tables
-            search_tables = []
-            for table in tables_result:
-                table_name = table["name"].upper()
-                if any(
-                    keyword in table_name
-                    for keyword in [
-                        "SEARCH",
-                        "INDEX",
-                        "CHUNK",
-                        "DOCUMENT",
-                        "VET",
-                        "PET",
-                    ]
-                ):
-                    search_tables.append(f"PETAPP.DATA.{table_name}")
-
-            if search_tables:
-                # Use the first likely table and do a simple text search
-                search_table = search_tables[0]
-                simple_sql = f"""
-                SELECT
-                    chunk,
-                    file_url,
-                    relative_path,
-                    title
-                FROM {search_table}
-                WHERE UPPER(chunk) LIKE UPPER('%{query.replace("'", "''")}%')
-                LIMIT {st.session_state.num_retrieved_chunks}
-                """
-
-                df = session.sql(simple_sql).to_pandas()
-                results = df.to_dict("records")
-            else:
-                # Fallback - return empty results
-                results = []
-
-        except Exception as inner_e:
-            st.error(f"Error with table search: {inner_e}")
-            # Return empty results as fallback
-            results = []
-
-        # Build context string from results
-        context_str = ""
-        for i, r in enumerate(results):
-            # Try different possible column names for the text content
-            text_content = ""
-            for col_name in ["chunk", "content", "text", "body"]:
-                if col_name in r and r[col_name]:
-                    text_content = r[col_name]
-                    break
-
-            if text_content:
-                context_str += f"Context document {i + 1}: {text_content} \n\n"
 
         if st.session_state.get("debug"):
             st.sidebar.text_area("Retrieved Context", context_str, height=400)
@@ -394,8 +564,9 @@ def query_cortex_search_service(query, columns=[], filter={}):
             st.sidebar.error(f"Search error details: {str(e)}")
             # Show more debugging info
             st.sidebar.write("Debug info:")
-            st.sidebar.write(f"Current Database: {session.get_current_database()}")
-            st.sidebar.write(f"Current Schema: {session.get_current_schema()}")
+            current_db, current_schema = get_session_context()
+            st.sidebar.write(f"Current Database: {current_db}")
+            st.sidebar.write(f"Current Schema: {current_schema}")
             st.sidebar.write(
                 f"Target Service: {st.session_state.selected_cortex_search_service}"
             )
@@ -410,16 +581,19 @@ def query_cortex_search_service(query, columns=[], filter={}):
         )
 
 
+def update_chat_history():
+    """Refresh the cached chat history string after a completed turn"""
+    n = st.session_state.num_chat_messages
+    st.session_state.history_str = "\n".join(
+        f"{m['role']}: {m['content']}" for m in st.session_state.messages[-n:]
+    )
+
+
 def get_chat_history():
     """Get recent chat history for context"""
-    n = st.session_state.num_chat_messages
-    # Only get up to but not including the latest user message
-    msgs = st.session_state.messages
-    if len(msgs) < 2:
-        return []
-    # Exclude the latest user message
-    relevant = msgs[max(0, len(msgs) - n - 1) : len(msgs) - 1]
-    return relevant
+    # Cached at the end of the previous turn, so it already excludes the
+    # latest user message
+    return st.session_state.history_str
 
 
 def complete(model, prompt):
@@ -438,6 +612,26 @@ def complete(model, prompt):
         return "Error: Could not generate completion."
 
 
+def stream_complete(model, prompt):
+    """Stream a Cortex completion chunk by chunk, falling back to complete()"""
+    try:
+        stream = iter(Complete(model, prompt, session=session, stream=True))
+        first = next(stream, None)
+    except Exception:
+        # Nothing streamed yet, so the SQL path can still answer in full
+        yield complete(model, prompt)
+        return
+
+    if first is None:
+        return
+    yield first
+    try:
+        yield from stream
+    except Exception as e:
+        # Keep the partial answer rather than appending an error to it
+        st.error(f"Error in completion: {e}")
+
+
 def make_chat_history_summary(chat_history, question):
     """Create a summary of chat history with current question for better context"""
     prompt = f"""
@@ -459,7 +653,7 @@ def make_chat_history_summary(chat_history, question):
     summary = complete(st.session_state.model_name, prompt)
 
     if st.session_state.get("debug"):
-        st.sidebar.text_area("Enhanced Query", summary.replace("$", "\$"), height=150)
+        st.sidebar.text_area("Enhanced Query", summary, height=150)
 
     return summary
 
@@ -467,26 +661,23 @@ def make_chat_history_summary(chat_history, question):
 def get_pet_context():
     """Build pet-specific context string"""
     pet_info = st.session_state.pet_info
-    if not pet_info or not any(pet_info.values()):
-        return ""
-
-    pet_details = []
-    if pet_info.get("name"):
-        pet_details.append(f"Pet name: {pet_info['name']}")
-    if pet_info.get("type"):
-        pet_details.append(f"Type: {pet_info['type']}")
-    if pet_info.get("breed"):
-        pet_details.append(f"Breed: {pet_info['breed']}")
-    if pet_info.get("age"):
-        pet_details.append(f"Age: {pet_info['age']} years")
-    if pet_info.get("weight"):
-        pet_details.append(f"Weight: {pet_info['weight']} lbs")
-    if pet_info.get("spayed_neutered"):
-        pet_details.append(f"Spayed/Neutered: {pet_info['spayed_neutered']}")
-    if pet_info.get("medical_conditions"):
-        pet_details.append(f"Medical conditions: {pet_info['medical_conditions']}")
-
-    return f"\n\nPet Information: {', '.join(pet_details)}"
+    # Reuse the formatted string until the pet info changes
+    pet_info_hash = hash(tuple(sorted(pet_info.items())))
+    if st.session_state.get("pet_ctx_hash") == pet_info_hash:
+        return st.session_state.pet_ctx_str
+
+    pet_details = [
+        f"{label}: {pet_info[key]}{suffix}"
+        for key, label, suffix in PET_CONTEXT_FIELDS
+        if pet_info.get(key)
+    ]
+    pet_context = ""
+    if pet_details:
+        pet_context = f"\n\nPet Information: {', '.join(pet_details)}"
+
+    st.session_state.pet_ctx_hash = pet_info_hash
+    st.session_state.pet_ctx_str = pet_context
+    return pet_context
 
 
 def create_prompt(user_question):
@@ -494,7 +685,13 @@ def create_prompt(user_question):
     # Handle chat history
     if st.session_state.use_chat_history:
         chat_history = get_chat_history()
-        if chat_history:
+        # Only rewrite the question with chat history when it looks like a
+        # follow-up, saving a Cortex Complete round-trip for standalone questions
+        needs_rewrite = (
+            bool(FOLLOW_UP_PATTERN.search(user_question))
+            or len(user_question.split()) < 6
+        )
+        if chat_history and needs_rewrite:
             question_summary = make_chat_history_summary(chat_history, user_question)
             prompt_context, results = query_cortex_search_service(
                 question_summary,
@@ -600,7 +797,7 @@ def display_main_interface():
 def main():
     """Main application function"""
     # Initialize session state
-    init_service_metadata()
+    init_service_index()
     init_pet_info()
     init_selected_service()
     init_messages()
@@ -617,10 +814,25 @@ def main():
     # Chat interface
     icons = {"assistant": "🤖", "user": "👤"}
 
-    # Display chat messages
-    for message in st.session_state.messages:
+    # Display chat messages, collapsing older history so reruns only render the
+    # most recent exchanges
+    # (content is stored raw and dollar-escaped only where it is drawn, so
+    # redrawn history matches the live stream)
+    messages = st.session_state.messages
+    num_recent = 2 * st.session_state.num_chat_messages
+    recent = messages[-num_recent:]
+    num_earlier = len(messages) - len(recent)
+    # Expander contents are always sent to the browser, so older messages are
+    # gated behind a toggle to keep them out of the render entirely
+    if num_earlier and st.toggle(
+        f"Show {num_earlier} earlier messages", key="show_earlier_messages"
+    ):
+        for message in messages[:num_earlier]:
+            with st.chat_message(message["role"], avatar=icons[message["role"]]):
+                st.markdown(message["content"].translate(DOLLAR_ESCAPE_TABLE))
+    for message in recent:
         with st.chat_message(message["role"], avatar=icons[message["role"]]):
-            st.markdown(message["content"])
+            st.markdown(message["content"].translate(DOLLAR_ESCAPE_TABLE))
 
     # Check if we can chat
     disable_chat = (
@@ -651,7 +863,7 @@ def main():
         st.session_state.messages.append({"role": "user", "content": question})
 
         with st.chat_message("user", avatar=icons["user"]):
-            st.markdown(question.replace("$", "\$"))
+            st.markdown(question.translate(DOLLAR_ESCAPE_TABLE))
 
         # Generate assistant response
         with st.chat_message("assistant", avatar=icons["assistant"]):
@@ -662,26 +874,44 @@ def main():
                 cleaned_question = question.replace("'", "")
                 prompt, results = create_prompt(cleaned_question)
 
-                # Generate response
-                generated_response = complete(st.session_state.model_name, prompt)
-
                 # Build references if available
                 references = ""
                 if results:
-                    references = "\n\n###### 📚 References \n\n| Document | Source |\n|----------|--------|\n"
-                    for ref in results:
-                        title = ref.get("title", ref.get("relative_path", "Unknown"))
-                        url = ref.get("file_url", "#")
-                        references += f"| {title} | [View Source]({url}) |\n"
-
-                # Display response with references
-                full_response = generated_response + references
-                message_placeholder.markdown(full_response)
+                    reference_rows = [
+                        f"| {ref.get('title', ref.get('relative_path', 'Unknown'))} "
+                        f"| [View Source]({ref.get('file_url', '#')}) |"
+                        for ref in results
+                    ]
+                    references = (
+                        "\n\n###### 📚 References \n\n| Document | Source |\n|----------|--------|\n"
+                        + "\n".join(reference_rows)
+                        + "\n"
+                    )
+
+            # Stream response, redrawing the placeholder every few chunks. The
+            # cursor goes up first so the bubble isn't empty while waiting for
+            # the first chunk, or for a full answer from the SQL fallback
+            message_placeholder.markdown("▌")
+            response_chunks = []
+            display_buf = ""
+            for i, chunk in enumerate(
+                stream_complete(st.session_state.model_name, prompt)
+            ):
+                response_chunks.append(chunk)
+                display_buf += chunk.translate(DOLLAR_ESCAPE_TABLE)
+                if i % STREAM_RENDER_EVERY == 0:
+                    message_placeholder.markdown(display_buf + "▌")
+            generated_response = "".join(response_chunks)
+
+            # Display response with references
+            full_response = display_buf + references
+            message_placeholder.markdown(full_response)
 
         # Save assistant message
         st.session_state.messages.append(
             {"role": "assistant", "content": generated_response}
         )
+        update_chat_history()
 
     # Footer
     st.markdown("---")
@@ -1,9 +1,24 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+import hashlib
+import html
 import json
+import re
+import time
 from snowflake.snowpark.context import get_active_session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+
+# Streaming completions need snowflake-ml-python; fall back to SQL without it
+try:
+    from snowflake.cortex import Complete
+except ImportError:
+    Complete = None
+
+# orjson is much faster for large SEARCH payloads; fall back to json without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Get the current Snowflake session
 session = get_active_session()
@@ -16,8 +31,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better styling
-st.markdown("""
+# Static HTML blocks are built once per process and shared across reruns
+@st.cache_resource
+def _css() -> str:
+    """Custom CSS for better styling"""
+    return """
 <style>
     .main-header {
         text-align: center;
@@ -70,7 +88,63 @@ st.markdown("""
         border-left: 3px solid #2E86AB;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _disclaimer_html() -> str:
+    """Medical disclaimer shown above the chat"""
+    return """
+    <div class="warning-box">
+        <strong>⚠️ Important Medical Disclaimer:</strong><br>
+        This AI assistant provides general information about pet health for educational purposes only. 
+        It is not a substitute for professional veterinary advice, diagnosis, or treatment. 
+        Always consult with a qualified veterinarian for your pet's specific health concerns.
+        <strong>In case of emergency, contact your veterinarian or emergency animal hospital immediately.</strong>
+    </div>
+    """
+
+@st.cache_resource
+def _footer_html() -> str:
+    """Tips and credits shown below the chat"""
+    return """
+    <div style="text-align: center; color: #666; font-size: 0.9em;">
+        💡 <strong>Tips:</strong> Be specific about your pet's symptoms or concerns. 
+        Include your pet's species, breed, age, and any relevant medical history for better assistance.
+        <br><br>
+        🔧 <strong>Powered by:</strong> Snowflake Cortex AI • Built with Streamlit in Snowflake
+    </div>
+    """
+
+_SYSTEM_PROMPT = """You are a helpful veterinary assistant AI designed to provide general information about pet health. 
+
+IMPORTANT GUIDELINES:
+- Provide helpful, accurate information based on the knowledge base context
+- Always include appropriate medical disclaimers
+- Remind users to consult with a licensed veterinarian for proper diagnosis and treatment
+- Never provide specific medical diagnoses or treatment recommendations
+- If the question involves emergency symptoms, advise immediate veterinary care
+- Be empathetic and understanding of pet owners' concerns
+- Keep responses concise but informative"""
+
+# Pet info fields included in the prompt, in order
+_PET_FIELDS = [
+    ("name", "Pet name: {}"),
+    ("type", "Type: {}"),
+    ("breed", "Breed: {}"),
+    ("age", "Age: {} years"),
+    ("weight", "Weight: {} lbs"),
+    ("spayed_neutered", "Spayed/Neutered: {}"),
+    ("medical_conditions", "Medical conditions: {}"),
+]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _format_pet_context(pet_items: tuple) -> str:
+    """Format the pet information block from sorted pet_info items"""
+    pet_info = dict(pet_items)
+    pet_details = [fmt.format(pet_info[k]) for k, fmt in _PET_FIELDS if pet_info.get(k)]
+    if not pet_details:
+        return ""
+    return f"\n\nPet Information:\n{', '.join(pet_details)}"
 
 class SnowflakeRAGService:
     """Handles RAG operations using Snowflake Cortex SQL functions"""
@@ -81,80 +155,24 @@ class SnowflakeRAGService:
     def search_documents(self, query: str, search_service: str, limit: int = 5) -> List[Dict]:
         """Search for relevant documents using SNOWFLAKE.CORTEX.SEARCH SQL function"""
         try:
-            # Escape single quotes in query
-            escaped_query = query.replace("'", "''")
-            
-            # Build the search SQL query
-            search_sql = f"""
-            SELECT SNOWFLAKE.CORTEX.SEARCH(
-                '{search_service}',
-                '{escaped_query}',
-                {{'limit': {limit}}}
-            ) as search_results
-            """
-            
-            # Execute the search
-            result_df = self.session.sql(search_sql).collect()
-            
-            if result_df and len(result_df) > 0:
-                search_result = result_df[0]['SEARCH_RESULTS']
-                if isinstance(search_result, str):
-                    # Parse JSON string if needed
-                    import json
-                    search_data = json.loads(search_result)
-                else:
-                    search_data = search_result
-                
-                # Extract results array
-                if isinstance(search_data, dict) and 'results' in search_data:
-                    return search_data['results']
-                elif isinstance(search_data, list):
-                    return search_data
-                else:
-                    return [search_data] if search_data else []
-            
-            return []
+            # Identical searches within the TTL are served from memory
+            return _cached_search(_normalize(query), query, search_service, limit)
             
         except Exception as e:
             st.error(f"Search failed: {str(e)}")
             return []
     
-    def generate_response(self, query: str, context: str, pet_info: Dict = None, 
-                         model: str = "llama3-8b") -> str:
-        """Generate response using SNOWFLAKE.CORTEX.COMPLETE SQL function"""
-        try:
-            # Build pet context if available
-            pet_context = ""
-            if pet_info and any(pet_info.values()):
-                pet_details = []
-                if pet_info.get('name'):
-                    pet_details.append(f"Pet name: {pet_info['name']}")
-                if pet_info.get('type'):
-                    pet_details.append(f"Type: {pet_info['type']}")
-                if pet_info.get('breed'):
-                    pet_details.append(f"Breed: {pet_info['breed']}")
-                if pet_info.get('age'):
-                    pet_details.append(f"Age: {pet_info['age']} years")
-                if pet_info.get('weight'):
-                    pet_details.append(f"Weight: {pet_info['weight']} lbs")
-                if pet_info.get('spayed_neutered'):
-                    pet_details.append(f"Spayed/Neutered: {pet_info['spayed_neutered']}")
-                if pet_info.get('medical_conditions'):
-                    pet_details.append(f"Medical conditions: {pet_info['medical_conditions']}")
-                
-                if pet_details:
-                    pet_context = f"\n\nPet Information:\n{', '.join(pet_details)}"
-            
-            prompt = f"""You are a helpful veterinary assistant AI designed to provide general information about pet health. 
-
-IMPORTANT GUIDELINES:
-- Provide helpful, accurate information based on the knowledge base context
-- Always include appropriate medical disclaimers
-- Remind users to consult with a licensed veterinarian for proper diagnosis and treatment
-- Never provide specific medical diagnoses or treatment recommendations
-- If the question involves emergency symptoms, advise immediate veterinary care
-- Be empathetic and understanding of pet owners' concerns
-- Keep responses concise but informative
+    def _build_prompt(self, query: str, context: str, pet_info: Dict = None) -> str:
+        """Build the COMPLETE prompt from the static system block and the query"""
+        # Build pet context if available; the sidebar tracks whether any
+        # field is set so unfilled pet info costs nothing per message
+        pet_context = ""
+        if pet_info and st.session_state.get("pet_info_filled"):
+            pet_context = _format_pet_context(tuple(sorted(pet_info.items())))
+        
+        # Static instructions first, so the prompt prefix is identical
+        # across calls and only the tail varies
+        return f"""{_SYSTEM_PROMPT}
 
 Context from veterinary knowledge base:
 {context}
@@ -163,23 +181,22 @@ Context from veterinary knowledge base:
 User Question: {query}
 
 Please provide a helpful, informative response while maintaining appropriate medical disclaimers."""
+    
+    def generate_response(self, query: str, context: str, pet_info: Dict = None, 
+                         model: str = "llama3-8b") -> str:
+        """Generate response using SNOWFLAKE.CORTEX.COMPLETE SQL function"""
+        try:
+            prompt = self._build_prompt(query, context, pet_info)
 
-            # Escape single quotes in the prompt
-            escaped_prompt = prompt.replace("'", "''")
-            
-            # Build the completion SQL query
-            completion_sql = f"""
-            SELECT SNOWFLAKE.CORTEX.COMPLETE(
-                '{model}',
-                '{escaped_prompt}'
-            ) as response
-            """
+            # Execute the completion with bound parameters, fetching the single
+            # result row without materializing the whole result set
+            row = next(iter(self.session.sql(
+                "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS RESPONSE",
+                params=[model, prompt]
+            ).to_local_iterator()), None)
             
-            # Execute the completion
-            result_df = self.session.sql(completion_sql).collect()
-            
-            if result_df and len(result_df) > 0:
-                response = result_df[0]['RESPONSE']
+            if row:
+                response = row['RESPONSE']
                 return response if response else "I'm sorry, I couldn't generate a response at this time."
             
             return "I'm sorry, I couldn't generate a response at this time."
@@ -187,13 +204,118 @@ Please provide a helpful, informative response while maintaining appropriate med
         except Exception as e:
             st.error(f"Response generation failed: {str(e)}")
             return "I encountered an error while processing your question. Please try again."
+    
+    def stream_response(self, query: str, context: str, pet_info: Dict = None,
+                        model: str = "llama3-8b") -> Iterator[str]:
+        """Stream a response chunk by chunk, falling back to the SQL path
+        
+        Failures before the first chunk fall back to generate_response();
+        later ones propagate so the caller can mark the answer as cut off.
+        """
+        first = None
+        if Complete is not None:
+            prompt = self._build_prompt(query, context, pet_info)
+            try:
+                stream = iter(Complete(model, prompt, session=self.session, stream=True))
+                first = next(stream, None)
+            except Exception:
+                # Streaming unavailable or failed before producing anything
+                first = None
+        
+        if first is None:
+            yield self.generate_response(query, context, pet_info, model)
+            return
+        
+        yield first
+        yield from stream
+
+@st.cache_resource
+def get_rag_service():
+    """Get the RAG service, built once per app process and shared by sessions"""
+    return SnowflakeRAGService(session)
+
+def _normalize(q: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace for cache keys"""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", q.lower())).strip()
+
+@st.cache_data(ttl=300, max_entries=256, show_spinner=False)
+def _cached_search(norm_query: str, _original_query: str, search_service: str,
+                   limit: int) -> List[Dict]:
+    """Run a Cortex SEARCH and return the parsed results
+    
+    Cached on the normalized query; the leading underscore keeps the original
+    query out of the cache key while it is still what Cortex searches for.
+    """
+    # Execute the search with bound parameters so the statement text
+    # stays constant and the query never needs escaping. There is exactly one
+    # row, so fetch it directly instead of collecting the result set.
+    row = next(iter(get_rag_service().session.sql(
+        "SELECT SNOWFLAKE.CORTEX.SEARCH(?, ?, PARSE_JSON(?)) AS SEARCH_RESULTS",
+        params=[search_service, _original_query, json.dumps({"limit": limit})]
+    ).to_local_iterator()), None)
+    
+    if row:
+        search_result = row['SEARCH_RESULTS']
+        if isinstance(search_result, str):
+            # Parse JSON string if needed
+            search_data = orjson.loads(search_result) if orjson else json.loads(search_result)
+        else:
+            search_data = search_result
+        
+        # Extract results array
+        if isinstance(search_data, dict) and 'results' in search_data:
+            return search_data['results']
+        elif isinstance(search_data, list):
+            return search_data
+        else:
+            return [search_data] if search_data else []
+    
+    return []
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _validate_service(name: str) -> Optional[str]:
+    """Run a one-result query against a search service, returning the error if any"""
+    try:
+        # Go through the search cache directly; search_documents swallows errors
+        _cached_search(_normalize("ping"), "ping", name, 1)
+        return None
+    except Exception as e:
+        return str(e)
+
+# Available models in Snowflake Cortex
+_AVAILABLE_MODELS = (
+    "llama3-8b",
+    "llama3-70b",
+    "llama3.1-8b",
+    "llama3.1-70b",
+    "llama3.1-405b",
+    "mixtral-8x7b",
+    "mistral-large",
+    "mistral-7b",
+    "reka-flash",
+    "reka-core",
+    "gemma-7b",
+)
+_MODEL_INDEX = {m: i for i, m in enumerate(_AVAILABLE_MODELS)}
+
+_SAMPLE_QUESTIONS = (
+    "What are signs of dehydration in dogs?",
+    "How often should I feed my kitten?",
+    "What vaccinations does my puppy need?",
+    "Is chocolate dangerous for dogs?",
+    "How can I tell if my cat is stressed?",
+    "Common symptoms of pet allergies?",
+    "When should I worry about my pet's behavior?",
+    "How to introduce pets to each other?",
+)
 
 def initialize_session_state():
     """Initialize session state variables"""
     if 'messages' not in st.session_state:
         st.session_state.messages = []
-    if 'rag_service' not in st.session_state:
-        st.session_state.rag_service = SnowflakeRAGService(session)
+        st.session_state.user_count = 0
+        st.session_state.assistant_count = 0
+        st.session_state.total_sources = 0
     if 'search_service' not in st.session_state:
         st.session_state.search_service = ""
     if 'selected_model' not in st.session_state:
@@ -213,26 +335,20 @@ def display_configuration_sidebar():
     
     if search_service:
         st.session_state.search_service = search_service
+        
+        # Validate once whenever the service name changes
+        if search_service != st.session_state.get('validated_service'):
+            st.session_state.validated_service = search_service
+            if _validate_service(search_service) is None:
+                st.sidebar.caption(f"✅ Connected to `{search_service}`")
+            else:
+                st.sidebar.caption(f"⚠️ Could not reach `{search_service}`")
     
     # Model selection - Available models in Snowflake Cortex
-    available_models = [
-        "llama3-8b",
-        "llama3-70b", 
-        "llama3.1-8b",
-        "llama3.1-70b",
-        "llama3.1-405b",
-        "mixtral-8x7b",
-        "mistral-large",
-        "mistral-7b",
-        "reka-flash",
-        "reka-core",
-        "gemma-7b"
-    ]
-    
     selected_model = st.sidebar.selectbox(
         "LLM Model",
-        options=available_models,
-        index=available_models.index(st.session_state.selected_model) if st.session_state.selected_model in available_models else 0,
+        options=_AVAILABLE_MODELS,
+        index=_MODEL_INDEX.get(st.session_state.selected_model, 0),
         help="Choose the language model for generating responses"
     )
     st.session_state.selected_model = selected_model
@@ -247,16 +363,12 @@ def display_configuration_sidebar():
         if not st.session_state.search_service:
             st.sidebar.error("Please enter a search service name")
         else:
-            try:
-                st.write("Testing..."):
-                    test_results = st.session_state.rag_service.search_documents(
-                        "test query", 
-                        st.session_state.search_service, 
-                        limit=1
-                    )
-                    st.sidebar.success("✅ Configuration valid!")
-            except Exception as e:
-                st.sidebar.error(f"❌ Configuration error: {str(e)}")
+            with st.spinner("Testing..."):
+                error = _validate_service(st.session_state.search_service)
+            if error is None:
+                st.sidebar.success("✅ Configuration valid!")
+            else:
+                st.sidebar.error(f"❌ Configuration error: {error}")
 
 def display_pet_info_sidebar():
     """Display pet information input in sidebar"""
@@ -293,6 +405,7 @@ def display_pet_info_sidebar():
             "spayed_neutered": spayed_neutered if spayed_neutered != "Unknown" else None,
             "medical_conditions": medical_conditions if medical_conditions else None
         }
+        st.session_state.pet_info_filled = any(v is not None for v in st.session_state.pet_info.values())
 
 def display_conversation_controls():
     """Display conversation control buttons"""
@@ -303,7 +416,14 @@ def display_conversation_controls():
     with col1:
         if st.button("🗑️ Clear Chat", use_container_width=True):
             st.session_state.messages = []
+            st.session_state.user_count = 0
+            st.session_state.assistant_count = 0
+            st.session_state.total_sources = 0
             st.rerun()
+        if st.button("🧹 Clear Cache", use_container_width=True):
+            _cached_search.clear()
+            _validate_service.clear()
+            st.sidebar.success("Search cache cleared")
     
     with col2:
         if st.button("📥 Export", use_container_width=True) and st.session_state.messages:
@@ -312,12 +432,23 @@ def display_conversation_controls():
                 "pet_info": st.session_state.get('pet_info', {}),
                 "search_service": st.session_state.get('search_service', ''),
                 "model": st.session_state.get('selected_model', ''),
-                "messages": st.session_state.messages
+                # Message timestamps are epoch ms; format them only for export
+                # and leave out the pre-rendered HTML
+                "messages": [
+                    {**{k: v for k, v in m.items() if k != "rendered_html"},
+                     "timestamp": datetime.fromtimestamp(m["timestamp"] / 1000, tz=timezone.utc).isoformat()}
+                    for m in st.session_state.messages
+                ]
             }
             
+            if orjson:
+                export_data = orjson.dumps(chat_export, option=orjson.OPT_INDENT_2).decode()
+            else:
+                export_data = json.dumps(chat_export, indent=2)
+            
             st.download_button(
                 "Download Chat History",
-                data=json.dumps(chat_export, indent=2, default=str),
+                data=export_data,
                 file_name=f"pet_health_chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json",
                 use_container_width=True
@@ -325,66 +456,70 @@ def display_conversation_controls():
 
 def display_sample_questions():
     """Display sample questions for users"""
-    st.sidebar.markdown("### 💡 Quick Questions")
-    
-    sample_questions = [
-        "What are signs of dehydration in dogs?",
-        "How often should I feed my kitten?",
-        "What vaccinations does my puppy need?",
-        "Is chocolate dangerous for dogs?",
-        "How can I tell if my cat is stressed?",
-        "Common symptoms of pet allergies?",
-        "When should I worry about my pet's behavior?",
-        "How to introduce pets to each other?"
-    ]
-    
-    # Create a more compact display
-    st.sidebar.markdown("Click a question to ask it:")
-    for i, question in enumerate(sample_questions):
-        if st.sidebar.button(f"❓ {question}", key=f"sample_{i}", use_container_width=True):
+    # One selectbox and one button instead of a button per question
+    with st.sidebar.expander("💡 Quick Questions", expanded=False):
+        question = st.selectbox("Quick questions", ("",) + _SAMPLE_QUESTIONS)
+        if st.button("❓ Ask", use_container_width=True, disabled=not question):
             st.session_state.current_question = question
             st.rerun()
 
+# Possible field names in Cortex Search results, in order of preference
+_CONTENT_KEYS = ("chunk", "content", "text", "document")
+_SCORE_KEYS = ("distance", "score", "similarity")
+_SOURCE_KEYS = ("file_name", "source", "document_name")
+
+# Upper bound on the knowledge base context sent to COMPLETE
+_MAX_CONTEXT_CHARS = 8000
+
 def format_context_from_search(search_results: List[Dict]) -> tuple[str, List[Dict]]:
     """Format search results into context for the LLM and return source info"""
     if not search_results:
         return "No relevant information found in the knowledge base.", []
     
-    context_parts = []
-    sources = []
-    
-    for i, result in enumerate(search_results, 1):
+    # Extract the chunks, skipping duplicates (the same FAQ often appears
+    # across several documents)
+    chunks = []
+    seen = set()
+    for result in search_results:
         # Handle different possible result structures from Cortex Search
         if isinstance(result, dict):
-            # Try different possible field names for content
-            content = (result.get('chunk') or 
-                      result.get('content') or 
-                      result.get('text') or 
-                      result.get('document') or 
-                      str(result))
-            
-            # Try different possible field names for score/distance
-            score = (result.get('distance') or 
-                    result.get('score') or 
-                    result.get('similarity') or 
-                    'N/A')
-            
-            # Try different possible field names for source
-            source = (result.get('file_name') or 
-                     result.get('source') or 
-                     result.get('document_name') or 
-                     f'Document {i}')
+            # Take the first non-empty value among the possible field names;
+            # a score of 0 (an exact match by distance) is still a score
+            content = next(filter(None, map(result.get, _CONTENT_KEYS)), None) or str(result)
+            score = next((v for v in map(result.get, _SCORE_KEYS) if v is not None), 'N/A')
+            source = next(filter(None, map(result.get, _SOURCE_KEYS)), None)
         else:
             content = str(result)
             score = 'N/A'
-            source = f'Document {i}'
+            source = None
         
-        context_parts.append(f"[Source {i}]: {content}")
+        content_str = content if isinstance(content, str) else str(content)
+        fingerprint = hashlib.blake2b(content_str.encode(), digest_size=8).digest()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        chunks.append((content_str, score, source))
+    
+    # Greedily pack chunks into the context budget, in the order Cortex
+    # ranked them so the most relevant ones are kept
+    context_parts = []
+    sources = []
+    used = 0
+    for i, (content_str, score, source) in enumerate(chunks, 1):
+        part = f"[Source {i}]: {content_str}"
+        if used + len(part) > _MAX_CONTEXT_CHARS:
+            if context_parts:
+                break
+            # Always keep (a truncated) top chunk
+            part = part[:_MAX_CONTEXT_CHARS]
+        context_parts.append(part)
+        used += len(part) + 2
         sources.append({
             'index': i,
-            'content': content[:200] + "..." if len(str(content)) > 200 else content,
+            'content': content_str[:200] + "..." if len(content_str) > 200 else content_str,
             'score': score,
-            'source': source
+            # Unnamed sources are numbered like the context, after dedupe
+            'source': source or f'Document {i}'
         })
     
     return "\n\n".join(context_parts), sources
@@ -397,25 +532,38 @@ def display_sources_info(sources: List[Dict]):
                 st.markdown(f"""
                 <div class="source-info">
                     <strong>Source {source['index']}</strong> - Distance: {source['score']}<br>
-                    <em>{source['source']}</em><br>
-                    {source['content']}
+                    <em>{html.escape(str(source['source']))}</em><br>
+                    {html.escape(source['content'])}
                 </div>
                 """, unsafe_allow_html=True)
 
+# CSS class and icon for each chat role
+_ROLE_STYLES = {
+    "user": ("user-message", "🧑"),
+    "assistant": ("assistant-message", "🤖"),
+}
+
+# Redraw the streaming answer once per this many chunks
+_STREAM_RENDER_EVERY = 8
+
+# Appended to an answer whose stream failed partway through
+_INTERRUPTED_NOTE = "\n\n⚠️ This response was interrupted before it finished. Please try asking again."
+
+def _render_message(role: str, content: str) -> str:
+    """Render a chat message to escaped HTML, once, when it is appended"""
+    message_class, icon = _ROLE_STYLES[role]
+    body = html.escape(str(content)).replace("\n", "<br>")
+    return (
+        f'<div class="chat-message {message_class}">'
+        f'<strong>{icon} {role.title()}:</strong><br>{body}</div>'
+    )
+
 def display_chat_interface():
     """Display the main chat interface"""
     st.markdown('<h1 class="main-header">🐾 Pet Health Assistant</h1>', unsafe_allow_html=True)
     
     # Medical disclaimer
-    st.markdown("""
-    <div class="warning-box">
-        <strong>⚠️ Important Medical Disclaimer:</strong><br>
-        This AI assistant provides general information about pet health for educational purposes only. 
-        It is not a substitute for professional veterinary advice, diagnosis, or treatment. 
-        Always consult with a qualified veterinarian for your pet's specific health concerns.
-        <strong>In case of emergency, contact your veterinarian or emergency animal hospital immediately.</strong>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_disclaimer_html(), unsafe_allow_html=True)
     
     # Check if search service is configured
     if not st.session_state.search_service:
@@ -423,7 +571,7 @@ def display_chat_interface():
         return
     
     # Display current pet info if available
-    if st.session_state.get('pet_info') and any(st.session_state.pet_info.values()):
+    if st.session_state.get("pet_info_filled"):
         pet_info = st.session_state.pet_info
         pet_summary = []
         if pet_info.get('name'):
@@ -438,23 +586,26 @@ def display_chat_interface():
         if pet_summary:
             st.info(f"🐾 Current pet: {' • '.join(pet_summary)}")
     
-    # Display chat messages
+    # Display chat messages, batching consecutive messages into one markdown
+    # call and only breaking the batch where a sources expander is needed
     chat_container = st.container()
     with chat_container:
-        for i, message in enumerate(st.session_state.messages):
-            message_class = "user-message" if message["role"] == "user" else "assistant-message"
-            icon = "🧑" if message["role"] == "user" else "🤖"
-            
-            st.markdown(f"""
-            <div class="chat-message {message_class}">
-                <strong>{icon} {message["role"].title()}:</strong><br>
-                {message["content"]}
-            </div>
-            """, unsafe_allow_html=True)
+        parts = []
+        for message in st.session_state.messages:
+            # Messages are rendered on insert; re-emit the stored HTML
+            parts.append(
+                message.get("rendered_html")
+                or _render_message(message["role"], message["content"])
+            )
             
             # Display sources for assistant messages
-            if message["role"] == "assistant" and "sources" in message:
+            if message["role"] == "assistant" and message.get("sources"):
+                st.markdown("".join(parts), unsafe_allow_html=True)
+                parts = []
                 display_sources_info(message["sources"])
+        
+        if parts:
+            st.markdown("".join(parts), unsafe_allow_html=True)
     
     # Chat input
     question = st.chat_input("Ask me about your pet's health...")
@@ -466,16 +617,20 @@ def display_chat_interface():
     
     if question:
         # Add user message to chat
+        user_html = _render_message("user", question)
         st.session_state.messages.append({
             "role": "user", 
             "content": question, 
-            "timestamp": datetime.now()
+            "timestamp": time.time_ns() // 1_000_000,
+            "rendered_html": user_html
         })
+        st.session_state.user_count += 1
+        st.markdown(user_html, unsafe_allow_html=True)
         
-        with st.spinner("🔍 Searching knowledge base and generating response..."):
-            try:
+        try:
+            with st.spinner("🔍 Searching knowledge base..."):
                 # Search for relevant documents
-                search_results = st.session_state.rag_service.search_documents(
+                search_results = get_rag_service().search_documents(
                     query=question,
                     search_service=st.session_state.search_service,
                     limit=st.session_state.get('search_limit', 5)
@@ -483,64 +638,85 @@ def display_chat_interface():
                 
                 # Format context from search results
                 context, sources = format_context_from_search(search_results)
-                
-                # Generate response
-                response = st.session_state.rag_service.generate_response(
+            
+            # Stream the response into a placeholder, redrawing every few chunks
+            # (the cursor shows straight away, including while the SQL
+            # fallback generates the whole answer)
+            placeholder = st.empty()
+            placeholder.markdown("▌")
+            response = ""
+            interrupted = None
+            try:
+                for i, chunk in enumerate(get_rag_service().stream_response(
                     query=question,
                     context=context,
                     pet_info=st.session_state.get('pet_info'),
                     model=st.session_state.selected_model
-                )
-                
-                # Add assistant message to chat
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response, 
-                    "timestamp": datetime.now(),
-                    "sources": sources,
-                    "model": st.session_state.selected_model
-                })
-                
+                )):
+                    response += chunk
+                    if i % _STREAM_RENDER_EVERY == 0:
+                        placeholder.markdown(response + "▌")
             except Exception as e:
-                st.error(f"Error processing your question: {str(e)}")
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": "I apologize, but I encountered an error processing your question. Please try again or contact support if the issue persists.",
-                    "timestamp": datetime.now(),
-                    "sources": [],
-                    "error": str(e)
-                })
+                if not response:
+                    raise
+                # Keep the partial answer, but record that it was cut off
+                interrupted = str(e)
+                response += _INTERRUPTED_NOTE
+            placeholder.markdown(response)
+            
+            # Add assistant message to chat
+            assistant_message = {
+                "role": "assistant", 
+                "content": response, 
+                "timestamp": time.time_ns() // 1_000_000,
+                "rendered_html": _render_message("assistant", response),
+                "sources": sources,
+                "model": st.session_state.selected_model
+            }
+            if interrupted:
+                assistant_message["error"] = interrupted
+            st.session_state.messages.append(assistant_message)
+            st.session_state.assistant_count += 1
+            st.session_state.total_sources += len(sources)
+            
+        except Exception as e:
+            st.error(f"Error processing your question: {str(e)}")
+            apology = "I apologize, but I encountered an error processing your question. Please try again or contact support if the issue persists."
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": apology,
+                "timestamp": time.time_ns() // 1_000_000,
+                "rendered_html": _render_message("assistant", apology),
+                "sources": [],
+                "error": str(e)
+            })
+            st.session_state.assistant_count += 1
         
         st.rerun()
 
 def display_analytics():
     """Display simple analytics about the conversation"""
-    if st.session_state.messages:
-        st.sidebar.markdown("### 📊 Session Stats")
+    if not st.session_state.messages:
+        return
+    
+    with st.sidebar.expander("📊 Session Stats", expanded=False):
+        # Counts are maintained as messages are appended
+        user_count = st.session_state.user_count
+        assistant_count = st.session_state.assistant_count
         
-        user_messages = [msg for msg in st.session_state.messages if msg["role"] == "user"]
-        assistant_messages = [msg for msg in st.session_state.messages if msg["role"] == "assistant"]
+        # Average sources per response
+        avg_sources = st.session_state.total_sources / assistant_count if assistant_count else 0
         
         # Metrics in a more compact format
-        st.sidebar.markdown(f"""
+        st.markdown(f"""
         <div class="metric-card">
-            <strong>{len(user_messages)}</strong><br>
+            <strong>{user_count}</strong><br>
             Questions Asked
         </div>
-        """, unsafe_allow_html=True)
-        
-        st.sidebar.markdown(f"""
         <div class="metric-card">
-            <strong>{len(assistant_messages)}</strong><br>
+            <strong>{assistant_count}</strong><br>
             Responses Given
         </div>
-        """, unsafe_allow_html=True)
-        
-        # Average sources per response
-        total_sources = sum(len(msg.get("sources", [])) for msg in assistant_messages)
-        avg_sources = total_sources / len(assistant_messages) if assistant_messages else 0
-        
-        st.sidebar.markdown(f"""
         <div class="metric-card">
             <strong>{avg_sources:.1f}</strong><br>
             Avg. Sources Used
@@ -549,6 +725,7 @@ def display_analytics():
 
 def main():
     """Main application function"""
+    st.markdown(_css(), unsafe_allow_html=True)
     initialize_session_state()
     
     # Sidebar
@@ -566,14 +743,7 @@ def main():
     
     # Footer
     st.markdown("---")
-    st.markdown("""
-    <div style="text-align: center; color: #666; font-size: 0.9em;">
-        💡 <strong>Tips:</strong> Be specific about your pet's symptoms or concerns. 
-        Include your pet's species, breed, age, and any relevant medical history for better assistance.
-        <br><br>
-        🔧 <strong>Powered by:</strong> Snowflake Cortex AI • Built with Streamlit in Snowflake
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_footer_html(), unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()